@@ -1,13 +1,17 @@
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import hashlib
+import heapq
 import uuid
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
 import logging
 
 # Document processing imports
-import PyPDF2
+import fitz  # PyMuPDF
 from docx import Document
 import chromadb
 from chromadb.config import Settings
@@ -18,8 +22,64 @@ import re
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document as LangChainDocument
 
+from app.utils.pdf_pages import extract_pdf_page_range
+
 logger = logging.getLogger(__name__)
 
+# PDFs with fewer pages than this are extracted inline; the hand-off to the
+# worker pool costs more than it saves on small documents
+PDF_PARALLEL_MIN_PAGES = 16
+PDF_MAX_WORKERS = 4
+
+# HNSW index settings applied when a collection is first created. A larger
+# batch size and sync threshold defer index flushes during bulk inserts.
+HNSW_COLLECTION_METADATA = {
+    "hnsw:construction_ef": 100,
+    "hnsw:M": 16,
+    "hnsw:batch_size": 1000,
+    "hnsw:sync_threshold": 10000
+}
+
+# Supported MIME types -> (ChromaDB collection, extractor method)
+_FILE_TYPE_MAP = {
+    'application/pdf': ('pdf_documents', '_extract_pdf_text'),
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': ('word_documents', '_extract_docx_text'),
+    'application/msword': ('word_documents', '_extract_docx_text')
+}
+
+# Worker processes for large PDFs, shared by all documents and started on first use
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """Return the shared PDF extraction pool, starting it on first use"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # Spawn rather than fork: forking the multi-threaded server process can deadlock
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=min(PDF_MAX_WORKERS, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    """Stop the shared PDF extraction pool, e.g. on application shutdown"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown()
+            _pdf_pool = None
+
+def _hash_text_chunk(content_hasher, text: str):
+    """Feed one page, paragraph or row into the content hash, length-prefixed so chunk boundaries count"""
+    data = text.encode('utf-8', 'ignore')
+    content_hasher.update(len(data).to_bytes(8, 'little'))
+    content_hasher.update(data)
+
+
 class DocumentProcessingAgent:
     """
     Agent responsible for processing PDF and Word documents for RAG
@@ -60,23 +120,22 @@ class DocumentProcessingAgent:
                         file_name: str, 
                         file_type: str,
                         file_id: str,
-                        content_hash: str) -> Dict:
+                        content_hash: Optional[str] = None) -> Dict:
         """
         Main method to process documents for RAG
+        
+        When no content_hash is supplied, the hash of the extracted text
+        (computed during extraction) is used for duplicate detection.
         """
         try:
             # Check for duplicates
-            duplicate_info = self._check_duplicate(content_hash)
-            if duplicate_info['is_duplicate']:
-                return {
-                    'status': 'duplicate',
-                    'message': f'Document is a duplicate of {duplicate_info["original_file"]}',
-                    'chunks_processed': 0,
-                    'duplicate_info': duplicate_info
-                }
+            if content_hash:
+                duplicate_info = self._check_duplicate(content_hash)
+                if duplicate_info['is_duplicate']:
+                    return self._duplicate_result(duplicate_info)
             
             # Extract text content
-            text_content = self._extract_text(file_path, file_type)
+            text_content, text_hash = self._extract_text(file_path, file_type)
             if not text_content.strip():
                 return {
                     'status': 'error',
@@ -84,6 +143,12 @@ class DocumentProcessingAgent:
                     'chunks_processed': 0
                 }
             
+            if not content_hash:
+                content_hash = text_hash
+                duplicate_info = self._check_duplicate(content_hash)
+                if duplicate_info['is_duplicate']:
+                    return self._duplicate_result(duplicate_info)
+            
             # Create document chunks
             chunks = self._create_chunks(text_content, file_name, file_id)
             
@@ -111,53 +176,75 @@ class DocumentProcessingAgent:
                 'chunks_processed': 0
             }
     
-    def _extract_text(self, file_path: str, file_type: str) -> str:
-        """Extract text content from different document types"""
+    def _duplicate_result(self, duplicate_info: Dict) -> Dict:
+        """Build the response returned for an already processed document"""
+        return {
+            'status': 'duplicate',
+            'message': f'Document is a duplicate of {duplicate_info["original_file"]}',
+            'chunks_processed': 0,
+            'duplicate_info': duplicate_info
+        }
+    
+    def _extract_text(self, file_path: str, file_type: str) -> Tuple[str, str]:
+        """Extract text content and its content hash from different document types"""
         try:
-            if file_type == 'application/pdf':
-                return self._extract_pdf_text(file_path)
-            elif file_type in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                              'application/msword']:
-                return self._extract_docx_text(file_path)
-            else:
+            file_info = _FILE_TYPE_MAP.get(file_type)
+            if file_info is None:
                 raise ValueError(f"Unsupported document type: {file_type}")
+            _, extractor = file_info
+            return getattr(self, extractor)(file_path)
                 
         except Exception as e:
             logger.error(f"Error extracting text: {str(e)}")
             raise
     
-    def _extract_pdf_text(self, file_path: str) -> str:
-        """Extract text from PDF file"""
+    def _extract_pdf_text(self, file_path: str) -> Tuple[str, str]:
+        """Extract text from PDF file, splitting large documents across worker processes"""
         text_content = ""
+        content_hasher = hashlib.blake2b(digest_size=32)
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page_num, page in enumerate(pdf_reader.pages):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_content += f"\n--- Page {page_num + 1} ---\n"
-                            text_content += page_text
-                    except Exception as e:
-                        logger.warning(f"Error extracting text from page {page_num + 1}: {str(e)}")
-                        continue
+            with fitz.open(file_path) as doc:
+                page_count = doc.page_count
             
-            return self._clean_text(text_content)
+            if page_count < PDF_PARALLEL_MIN_PAGES:
+                pages = extract_pdf_page_range(file_path, 0, page_count)
+            else:
+                # MuPDF releases the GIL but is not thread-safe, so each worker
+                # opens the file itself and handles a contiguous page range
+                workers = min(PDF_MAX_WORKERS, os.cpu_count() or 1)
+                step = -(-page_count // workers)
+                starts = range(0, page_count, step)
+                page_ranges = _get_pdf_pool().map(
+                    extract_pdf_page_range,
+                    [file_path] * len(starts),
+                    starts,
+                    [min(start + step, page_count) for start in starts]
+                )
+                pages = [page for page_range in page_ranges for page in page_range]
+            
+            for page_num, page_text in pages:
+                text_content += f"\n--- Page {page_num + 1} ---\n"
+                text_content += page_text
+                _hash_text_chunk(content_hasher, page_text)
+            
+            return self._clean_text(text_content), content_hasher.hexdigest()
             
         except Exception as e:
             logger.error(f"Error reading PDF: {str(e)}")
             raise
     
-    def _extract_docx_text(self, file_path: str) -> str:
+    def _extract_docx_text(self, file_path: str) -> Tuple[str, str]:
         """Extract text from Word document"""
         try:
             doc = Document(file_path)
             text_content = ""
+            content_hasher = hashlib.blake2b(digest_size=32)
             
             # Extract paragraphs
             for paragraph in doc.paragraphs:
                 if paragraph.text.strip():
                     text_content += paragraph.text + "\n"
+                    _hash_text_chunk(content_hasher, paragraph.text)
             
             # Extract tables
             for table in doc.tables:
@@ -167,9 +254,11 @@ class DocumentProcessingAgent:
                         if cell.text.strip():
                             row_text.append(cell.text.strip())
                     if row_text:
-                        text_content += " | ".join(row_text) + "\n"
+                        row_line = " | ".join(row_text)
+                        text_content += row_line + "\n"
+                        _hash_text_chunk(content_hasher, row_line)
             
-            return self._clean_text(text_content)
+            return self._clean_text(text_content), content_hasher.hexdigest()
             
         except Exception as e:
             logger.error(f"Error reading Word document: {str(e)}")
@@ -219,13 +308,8 @@ class DocumentProcessingAgent:
     
     def _get_collection_name(self, file_type: str) -> str:
         """Get ChromaDB collection name based on file type"""
-        if file_type == 'application/pdf':
-            return 'pdf_documents'
-        elif file_type in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                          'application/msword']:
-            return 'word_documents'
-        else:
-            return 'documents'
+        collection_name, _ = _FILE_TYPE_MAP.get(file_type, ('documents', None))
+        return collection_name
     
     def _store_in_chromadb(self, chunks: List[Dict], collection_name: str, file_id: str, content_hash: str) -> int:
         """Store chunks in ChromaDB with embeddings"""
@@ -233,7 +317,10 @@ class DocumentProcessingAgent:
             # Get or create collection
             collection = self.chroma_client.get_or_create_collection(
                 name=collection_name,
-                metadata={"description": f"Collection for {collection_name}"}
+                metadata={
+                    **HNSW_COLLECTION_METADATA,
+                    "description": f"Collection for {collection_name}"
+                }
             )
             
             # Prepare data for ChromaDB
@@ -249,8 +336,8 @@ class DocumentProcessingAgent:
                 })
                 ids.append(chunk['chunk_id'])
             
-            # Generate embeddings
-            embeddings = self.embedding_model.encode(documents).tolist()
+            # Generate embeddings; Chroma accepts the float32 array directly
+            embeddings = self.embedding_model.encode(documents, convert_to_numpy=True)
             
             # Store in ChromaDB
             collection.add(
@@ -331,9 +418,8 @@ class DocumentProcessingAgent:
                     logger.warning(f"Error searching collection {coll_name}: {str(e)}")
                     continue
             
-            # Sort by distance (similarity)
-            results.sort(key=lambda x: x['distance'])
-            return results[:limit]
+            # Keep the closest matches (smallest distance) across collections
+            return heapq.nsmallest(limit, results, key=lambda x: x['distance'])
             
         except Exception as e:
             logger.error(f"Error searching documents: {str(e)}")
@@ -12,50 +12,86 @@ Features:
 import logging
 import json
 import asyncio
-from typing import TypedDict, List, Optional
+import string
+import time
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 from langgraph.graph import StateGraph, END
 from langchain_openai import ChatOpenAI
-from app.services.prompt_service import get_active_prompt
+from app.services.prompt_service import get_active_prompts
 from app.db.database import SessionLocal
 from datetime import datetime
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+
+def _json_dumps(value) -> str:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, default=str).decode()
+    return json.dumps(value, default=str)
+
 # --------------------------------------------------
 # Logger Configuration
 # --------------------------------------------------
 
 logger = logging.getLogger("ingestion-agent")
-logger.setLevel(logging.INFO)
-
-handler = logging.StreamHandler()
-formatter = logging.Formatter(
-    "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
-)
-handler.setFormatter(formatter)
 
 if not logger.handlers:
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(
+        "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+    ))
     logger.addHandler(handler)
+    # The handler above already writes every record; don't emit it again via root
+    logger.propagate = False
+
+# --------------------------------------------------
+# WebSocket Agent Names and Statuses
+# --------------------------------------------------
+
+AGENT_RULE_CLASSIFIER = "Rule-Based Classifier"
+AGENT_LLM_CLASSIFIER = "AI Classifier"
+AGENT_STORAGE_DECISION = "Storage Decision Agent"
+AGENT_ORCHESTRATOR = "Ingestion Orchestrator"
+
+STATUS_PROCESSING = "processing"
+STATUS_COMPLETED = "completed"
+STATUS_ERROR = "error"
 
 # --------------------------------------------------
 # Agent State Definition
 # --------------------------------------------------
 
-class IngestionState(TypedDict):
-    file_id: str
-    file_name: str
-    columns: List[str]
-    sample_rows: List[dict]
+@dataclass(slots=True)
+class IngestionState:
+    """
+    Graph state. Every field has a default so callers can invoke the graph
+    with a partial dict; nodes return only the fields they change.
+    """
+    file_id: str = ""
+    file_name: str = ""
+    columns: List[str] = field(default_factory=list)
+    sample_rows: List[dict] = field(default_factory=list)
     
     # Classification results
-    data_type: str
-    confidence: float
-    reasoning: str
-    method: str  # "rule-based" or "llm"
+    data_type: str = ""
+    confidence: float = 0.0
+    reasoning: str = ""
+    method: str = ""  # "rule-based" or "llm"
     
     # Storage decision
-    storage_type: str
+    storage_type: str = ""
     
     # WebSocket manager for real-time updates
-    websocket_manager: Optional[object]
+    websocket_manager: Optional[object] = None
 
 
 # --------------------------------------------------
@@ -67,7 +103,9 @@ try:
     if os.getenv("OPENAI_API_KEY"):
         llm = ChatOpenAI(
             model="gpt-4o-mini",
-            temperature=0
+            temperature=0,
+            # JSON mode: the model always returns a parseable JSON object
+            model_kwargs={"response_format": {"type": "json_object"}}
         )
     else:
         llm = None
@@ -76,250 +114,494 @@ except Exception as e:
     llm = None
     logger.warning(f"Failed to initialize LLM: {e}")
 
+# --------------------------------------------------
+# LLM Request Coalescing
+# --------------------------------------------------
+
+# Fallback prompts arriving within this window are sent to the model together
+LLM_BATCH_MAX_SIZE = 8
+LLM_BATCH_WINDOW_SECONDS = 0.05
+
+
+class LLMCoalescer:
+    """
+    Collects concurrent fallback prompts for a short window and sends them
+    to the model in one abatch call.
+    """
+
+    def __init__(self, model, max_batch_size: int = LLM_BATCH_MAX_SIZE,
+                 window_seconds: float = LLM_BATCH_WINDOW_SECONDS):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.window_seconds = window_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop = None
+
+    async def submit(self, prompt: str):
+        """Queue a prompt and wait for its model response."""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((future, prompt))
+        return await future
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _drain(self) -> list:
+        loop = asyncio.get_running_loop()
+        items = [await self._queue.get()]
+        deadline = loop.time() + self.window_seconds
+        while len(items) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def _run(self):
+        while True:
+            # Skip callers that were cancelled while waiting in the queue
+            pending = [(future, prompt) for future, prompt in await self._drain() if not future.done()]
+            if not pending:
+                continue
+
+            logger.info(f"[LLM BATCH] Sending {len(pending)} prompt(s)")
+            try:
+                responses = await self.model.abatch(
+                    [prompt for _, prompt in pending], return_exceptions=True
+                )
+            except Exception as e:
+                responses = [e] * len(pending)
+
+            for (future, _), response in zip(pending, responses):
+                if future.done():
+                    continue
+                if isinstance(response, BaseException):
+                    future.set_exception(response)
+                else:
+                    future.set_result(response)
+
+
+llm_coalescer = LLMCoalescer(llm) if llm is not None else None
+
+# --------------------------------------------------
+# Rule Tables (compiled once at import)
+# --------------------------------------------------
+
+TRANSACTION_REQUIRED = frozenset({
+    "acquirer_name", "transaction_date", "settlement_date",
+    "transaction_amount", "mdr_percentage"
+})
+TRANSACTION_OPTIONAL = frozenset({
+    "transaction_currency", "card_type", "network_type",
+    "terminal_id", "merchant_id"
+})
+
+RATE_CARD_REQUIRED = frozenset({
+    "acquirer", "terminal_id", "payment_mode",
+    "card_classification", "network", "agreed_mdr_rate"
+})
+RATE_CARD_OPTIONAL = frozenset({
+    "card_category", "applicable_sla_days", "sla_type",
+    "effective_date", "expiry_date"
+})
+
+ROUTING_REQUIRED = frozenset({
+    "terminal_id", "payment_method", "card_classification",
+    "network", "primary_acquirer"
+})
+ROUTING_OPTIONAL = frozenset({
+    "secondary_acquirer", "tertiary_acquirer", "routing_priority",
+    "effective_date", "expiry_date"
+})
+
+# Reported when no rule matches
+_RULE_PATTERN_NAMES = (
+    "Transaction data patterns",
+    "Rate card patterns",
+    "Routing rule patterns"
+)
+
+# data_type -> (storage_type, description); anything else is stored as a document
+STORAGE_MAP = {
+    "transaction": ("SQL_DATABASE", "Structured SQL database for transaction records"),
+    "reference": ("SQL_DATABASE", "Structured SQL database for reference data (rate cards, routing rules)"),
+}
+DOCUMENT_STORAGE = ("VECTOR_DATABASE", "Vector database for document embeddings and RAG")
+
+# Rule-based results at or above this confidence skip the LLM fallback
+LLM_FALLBACK_THRESHOLD = 0.7
+
+# Column headers are ASCII identifiers, so a translate table is enough to lowercase them
+_LOWER_TABLE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# (data_type, required, optional, reasoning, confidence, label, message, confidence_factors)
+# Evaluated in order; the first rule whose required columns are all present wins.
+_COMPILED_RULES = (
+    (
+        "transaction", TRANSACTION_REQUIRED, TRANSACTION_OPTIONAL,
+        "Strong pattern match: Contains transaction & settlement dates, amounts, MDR and acquirer details.",
+        0.95, "TRANSACTION",
+        "✅ Identified as Transaction Data - High confidence pattern match",
+        (
+            "Contains transaction and settlement dates",
+            "Has financial amounts and MDR data",
+            "Includes acquirer information"
+        )
+    ),
+    (
+        "reference", RATE_CARD_REQUIRED, RATE_CARD_OPTIONAL,
+        "Strong pattern match: Contains agreed MDR rates, SLA terms and card configuration details.",
+        0.90, "RATE_CARD",
+        "✅ Identified as Rate Card Data - High confidence pattern match",
+        (
+            "Contains agreed MDR rates",
+            "Has SLA terms and card configuration",
+            "Includes terminal and acquirer mapping"
+        )
+    ),
+    (
+        "reference", ROUTING_REQUIRED, ROUTING_OPTIONAL,
+        "Strong pattern match: Contains routing rules with primary and secondary acquirers.",
+        0.90, "ROUTING",
+        "✅ Identified as Routing Rules - High confidence pattern match",
+        (
+            "Contains routing rules with acquirer hierarchy",
+            "Has payment method and card classification",
+            "Includes terminal mapping"
+        )
+    ),
+)
+
+# One bit per column name any rule mentions; unknown columns map to 0
+_COL_BITS = {
+    name: 1 << bit
+    for bit, name in enumerate(sorted(frozenset().union(*(rule[1] | rule[2] for rule in _COMPILED_RULES))))
+}
+
+
+def _column_mask(names) -> int:
+    mask = 0
+    for name in names:
+        mask |= _COL_BITS.get(name, 0)
+    return mask
+
+
+# (required_mask, optional_mask) per rule, aligned with _COMPILED_RULES
+_RULE_MASKS = tuple((_column_mask(rule[1]), _column_mask(rule[2])) for rule in _COMPILED_RULES)
+
+# Distinct column masks to remember; daily uploads from the same source repeat them
+RULE_MATCH_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=RULE_MATCH_CACHE_SIZE)
+def _match_rules(mask: int) -> Optional[Tuple[tuple, frozenset]]:
+    """Return the first matching rule and the optional columns it found, or None."""
+    for rule, (required_mask, optional_mask) in zip(_COMPILED_RULES, _RULE_MASKS):
+        if mask & required_mask == required_mask:
+            optional_present = frozenset(name for name in rule[2] if mask & _COL_BITS[name])
+            return rule, optional_present
+    return None
+
 # --------------------------------------------------
 # Rule-based Classification with WebSocket Updates
 # --------------------------------------------------
 
-async def rule_based_classifier(state: IngestionState) -> IngestionState:
-    logger.info(f"[START] Rule-based classification for file={state['file_name']}")
+async def rule_based_classifier(state: IngestionState) -> dict:
+    logger.info(f"[START] Rule-based classification for file={state.file_name}")
     
     # Send WebSocket update
-    if state.get("websocket_manager"):
-        await state["websocket_manager"].send_agent_update(
-            state["file_id"],
-            "Rule-Based Classifier",
-            "processing",
+    if state.websocket_manager:
+        await state.websocket_manager.send_agent_update(
+            state.file_id,
+            AGENT_RULE_CLASSIFIER,
+            STATUS_PROCESSING,
             "Analyzing file structure and columns for pattern matching..."
         )
 
-    cols = {c.lower() for c in state["columns"]}
-    logger.info(f"[COLUMNS] Detected columns: {sorted(cols)}")
+    logger.info(f"[COLUMNS] Detected columns: {state.columns}")
 
-    # ---- TRANSACTION DATA RULE ----
-    transaction_required = {
-        "acquirer_name", "transaction_date", "settlement_date", 
-        "transaction_amount", "mdr_percentage"
-    }
-    transaction_optional = {
-        "transaction_currency", "card_type", "network_type", 
-        "terminal_id", "merchant_id"
-    }
+    mask = 0
+    for column in state.columns:
+        mask |= _COL_BITS.get(column.translate(_LOWER_TABLE), 0)
 
-    if transaction_required.issubset(cols):
-        logger.info("[MATCH] Classified as TRANSACTION via rules")
-        
-        if state.get("websocket_manager"):
-            await state["websocket_manager"].send_agent_update(
-                state["file_id"],
-                "Rule-Based Classifier", 
-                "completed",
-                "✅ Identified as Transaction Data - High confidence pattern match",
-                {
-                    "matched_columns": list(transaction_required),
-                    "optional_columns": list(transaction_optional.intersection(cols)),
-                    "confidence_factors": [
-                        "Contains transaction and settlement dates",
-                        "Has financial amounts and MDR data",
-                        "Includes acquirer information"
-                    ]
-                }
-            )
-        
-        return {
-            **state,
-            "data_type": "transaction",
-            "confidence": 0.95,
-            "method": "rule-based",
-            "reasoning": "Strong pattern match: Contains transaction & settlement dates, amounts, MDR and acquirer details."
-        }
+    match = _match_rules(mask)
+    if match is not None:
+        rule, optional_present = match
+        data_type, required, _, reasoning, confidence, label, message, factors = rule
 
-    # ---- RATE CARD RULE ----
-    rate_card_required = {
-        "acquirer", "terminal_id", "payment_mode", 
-        "card_classification", "network", "agreed_mdr_rate"
-    }
-    rate_card_optional = {
-        "card_category", "applicable_sla_days", "sla_type",
-        "effective_date", "expiry_date"
-    }
+        storage, storage_description = STORAGE_MAP.get(data_type, DOCUMENT_STORAGE)
+        logger.info(f"[MATCH] Classified as {label} via rules → {storage}")
 
-    if rate_card_required.issubset(cols):
-        logger.info("[MATCH] Classified as RATE_CARD via rules")
-        
-        if state.get("websocket_manager"):
-            await state["websocket_manager"].send_agent_update(
-                state["file_id"],
-                "Rule-Based Classifier",
-                "completed", 
-                "✅ Identified as Rate Card Data - High confidence pattern match",
+        if state.websocket_manager:
+            await state.websocket_manager.send_agent_update(
+                state.file_id,
+                AGENT_RULE_CLASSIFIER,
+                STATUS_COMPLETED,
+                message,
                 {
-                    "matched_columns": list(rate_card_required),
-                    "optional_columns": list(rate_card_optional.intersection(cols)),
-                    "confidence_factors": [
-                        "Contains agreed MDR rates",
-                        "Has SLA terms and card configuration",
-                        "Includes terminal and acquirer mapping"
-                    ]
+                    "matched_columns": list(required),
+                    "optional_columns": list(optional_present),
+                    "confidence_factors": factors,
+                    "storage_type": storage,
+                    "storage_description": storage_description
                 }
             )
-        
-        return {
-            **state,
-            "data_type": "reference",
-            "confidence": 0.90,
-            "method": "rule-based",
-            "reasoning": "Strong pattern match: Contains agreed MDR rates, SLA terms and card configuration details."
-        }
-
-    # ---- ROUTING RULE ----
-    routing_required = {
-        "terminal_id", "payment_method", "card_classification",
-        "network", "primary_acquirer"
-    }
-    routing_optional = {
-        "secondary_acquirer", "tertiary_acquirer", "routing_priority",
-        "effective_date", "expiry_date"
-    }
 
-    if routing_required.issubset(cols):
-        logger.info("[MATCH] Classified as ROUTING via rules")
-        
-        if state.get("websocket_manager"):
-            await state["websocket_manager"].send_agent_update(
-                state["file_id"],
-                "Rule-Based Classifier",
-                "completed",
-                "✅ Identified as Routing Rules - High confidence pattern match", 
-                {
-                    "matched_columns": list(routing_required),
-                    "optional_columns": list(routing_optional.intersection(cols)),
-                    "confidence_factors": [
-                        "Contains routing rules with acquirer hierarchy",
-                        "Has payment method and card classification",
-                        "Includes terminal mapping"
-                    ]
-                }
-            )
-        
+        # Storage is decided here, so the graph ends without the storage node
         return {
-            **state,
-            "data_type": "reference",
-            "confidence": 0.90,
-            "method": "rule-based", 
-            "reasoning": "Strong pattern match: Contains routing rules with primary and secondary acquirers."
+            "storage_type": storage,
+            "data_type": data_type,
+            "confidence": confidence,
+            "method": "rule-based",
+            "reasoning": reasoning
         }
 
     logger.warning("[NO MATCH] Rule-based classification failed. LLM fallback required.")
     
-    if state.get("websocket_manager"):
-        await state["websocket_manager"].send_agent_update(
-            state["file_id"],
-            "Rule-Based Classifier",
-            "completed",
+    if state.websocket_manager:
+        await state.websocket_manager.send_agent_update(
+            state.file_id,
+            AGENT_RULE_CLASSIFIER,
+            STATUS_COMPLETED,
             "⚠️ No pattern match found - Escalating to AI classifier",
             {
-                "analyzed_columns": sorted(cols),
-                "missing_patterns": [
-                    "Transaction data patterns",
-                    "Rate card patterns", 
-                    "Routing rule patterns"
-                ]
+                "analyzed_columns": sorted({c.translate(_LOWER_TABLE) for c in state.columns}),
+                "missing_patterns": _RULE_PATTERN_NAMES
             }
         )
 
     return {
-        **state,
         "confidence": 0.0,
         "method": "rule-based",
         "reasoning": "Rule-based classification could not determine data type - requires AI analysis."
     }
 
 # --------------------------------------------------
-# LLM Fallback Classifier with Enhanced Prompts
+# Prompt Loading (TTL cached)
 # --------------------------------------------------
 
-async def llm_fallback_classifier(state: IngestionState) -> IngestionState:
-    if state["confidence"] >= 0.7:
-        logger.info("[SKIP] LLM fallback not required")
-        return state
+PROMPT_AGENT_ROLE = "ingestion"
+PROMPT_TYPES = ("system", "task", "safety", "response")
+# Safety net for edits made outside the prompt API (or in another worker);
+# the API invalidates this process's cache directly
+PROMPT_CACHE_TTL_SECONDS = 300
 
-    logger.warning("[LLM] Invoking AI-powered fallback classifier")
-    
-    # Send WebSocket update
-    if state.get("websocket_manager"):
-        await state["websocket_manager"].send_agent_update(
-            state["file_id"],
-            "AI Classifier",
-            "processing",
-            "🤖 Analyzing data with AI - Loading classification prompts..."
-        )
+@dataclass(frozen=True, slots=True)
+class _DefaultPrompt:
+    """Stand-in for a Prompt row when the database has none (or is unreachable)."""
+    prompt_text: str
+
+
+_DEFAULT_SYSTEM = _DefaultPrompt('You are an expert data classification agent for financial transaction systems.')
+_DEFAULT_TASK = _DefaultPrompt('Classify the provided data as transaction, reference, or document type.')
+_DEFAULT_SAFETY = _DefaultPrompt('Ensure data privacy and security in your analysis.')
+_DEFAULT_RESPONSE = _DefaultPrompt('Respond with JSON: {"data_type": "type", "confidence": 0.0-1.0, "reasoning": "explanation"}')
+
+_DEFAULT_PROMPTS = {
+    "system": _DEFAULT_SYSTEM,
+    "task": _DEFAULT_TASK,
+    "safety": _DEFAULT_SAFETY,
+    "response": _DEFAULT_RESPONSE
+}
+
+# agent_role -> (loaded_at, {prompt_type: prompt})
+_prompt_cache: Dict[str, Tuple[float, dict]] = {}
+
+
+def _load_prompts(agent_role: str = PROMPT_AGENT_ROLE) -> dict:
+    """Return the prompt bundle for an agent role, hitting the database at most once per TTL."""
+    now = time.monotonic()
+    cached = _prompt_cache.get(agent_role)
+    if cached is not None and now - cached[0] < PROMPT_CACHE_TTL_SECONDS:
+        return cached[1]
 
     db = SessionLocal()
     try:
-        # Load prompts with error handling
-        try:
-            system_prompt = get_active_prompt(db, "ingestion", "system")
-            task_prompt = get_active_prompt(db, "ingestion", "task")
-            safety_prompt = get_active_prompt(db, "ingestion", "safety")
-            response_prompt = get_active_prompt(db, "ingestion", "response")
-        except Exception as e:
-            logger.error(f"Error loading prompts: {e}")
-            # Fallback to default prompts
-            system_prompt = type('obj', (object,), {'prompt_text': 'You are an expert data classification agent for financial transaction systems.'})()
-            task_prompt = type('obj', (object,), {'prompt_text': 'Classify the provided data as transaction, reference, or document type.'})()
-            safety_prompt = type('obj', (object,), {'prompt_text': 'Ensure data privacy and security in your analysis.'})()
-            response_prompt = type('obj', (object,), {'prompt_text': 'Respond with JSON: {"data_type": "type", "confidence": 0.0-1.0, "reasoning": "explanation"}'})()
+        loaded = get_active_prompts(db, agent_role, PROMPT_TYPES)
+    except Exception as e:
+        logger.error(f"Error loading prompts: {e}")
+        # Fallback to default prompts; not cached so the next call retries the database
+        return _DEFAULT_PROMPTS
     finally:
         db.close()
 
-    # Send WebSocket update about prompt loading
-    if state.get("websocket_manager"):
-        await state["websocket_manager"].send_agent_update(
-            state["file_id"],
-            "AI Classifier",
-            "processing",
-            "🧠 AI analysis in progress - Examining data patterns and structure..."
-        )
+    prompts = {
+        prompt_type: loaded.get(prompt_type) or _DEFAULT_PROMPTS[prompt_type]
+        for prompt_type in PROMPT_TYPES
+    }
+    _prompt_cache[agent_role] = (now, prompts)
+    return prompts
 
-    # Build comprehensive prompt
-    full_prompt = f"""
-{system_prompt.prompt_text}
 
-{task_prompt.prompt_text}
+def clear_prompt_cache():
+    """Drop cached prompts so the next classification reloads them from the database."""
+    _prompt_cache.clear()
+
 
-{safety_prompt.prompt_text}
+# Outer layout of the fallback prompt. The four prompt texts are substituted once per
+# prompt load; the doubled braces become the per-file placeholders filled by format_map.
+_PROMPT_LAYOUT = """
+{system}
+
+{task}
+
+{safety}
 
 ANALYSIS CONTEXT:
-File name: {state['file_name']}
-Columns detected: {state['columns']}
-Sample data rows: {state['sample_rows'][:3]}  # Limit sample for token efficiency
-Previous analysis: {state.get('reasoning', 'No previous analysis')}
+File name: {{file_name}}
+Columns detected: {{columns}}
+Sample data rows: {{sample_rows}}
+Previous analysis: {{previous_analysis}}
 
 CLASSIFICATION REQUIREMENTS:
 - transaction: Financial transaction records with amounts, dates, acquirer info
 - reference: Configuration data like rate cards, routing rules, lookup tables  
 - document: Unstructured content like PDFs, Word docs, reports
 
-{response_prompt.prompt_text}
+{response}
+Respond with a single JSON object.
 """
 
+
+def _escape_braces(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+@lru_cache(maxsize=8)
+def _build_prompt_template(system: str, task: str, safety: str, response: str) -> str:
+    """Pre-substitute the prompt texts, leaving only the per-file placeholders."""
+    return _PROMPT_LAYOUT.format(
+        system=_escape_braces(system),
+        task=_escape_braces(task),
+        safety=_escape_braces(safety),
+        response=_escape_braces(response)
+    )
+
+
+def preload_prompts():
+    """Load the ingestion prompt bundle eagerly, e.g. at application startup."""
+    clear_prompt_cache()
+    _load_prompts()
+
+# --------------------------------------------------
+# Prompt Sample Formatting
+# --------------------------------------------------
+
+# Keep the sample section of the prompt small and bounded in length
+SAMPLE_ROWS_IN_PROMPT = 3
+SAMPLE_VALUE_MAX_CHARS = 120
+
+
+def _format_sample_rows(rows: List[dict]) -> str:
+    """Serialise the first few sample rows as JSON, truncating long string values."""
+    sample = [
+        {
+            key: value[:SAMPLE_VALUE_MAX_CHARS] if isinstance(value, str) else value
+            for key, value in row.items()
+        }
+        for row in rows[:SAMPLE_ROWS_IN_PROMPT]
+    ]
+    return _json_dumps(sample)
+
+# --------------------------------------------------
+# WebSocket Update Batching
+# --------------------------------------------------
+
+class _UpdateBatcher:
+    """
+    Buffers agent updates for one file and sends them as a single WebSocket frame.
+    """
+
+    def __init__(self, websocket_manager, file_id: str):
+        self.websocket_manager = websocket_manager
+        self.file_id = file_id
+        self.updates: List[tuple] = []
+
+    def add(self, agent_name: str, status: str, message: str, data: Optional[dict] = None):
+        if self.websocket_manager:
+            self.updates.append((agent_name, status, message, data))
+
+    async def flush(self):
+        if not self.updates:
+            return
+        updates, self.updates = self.updates, []
+        if hasattr(self.websocket_manager, "send_batch"):
+            await self.websocket_manager.send_batch(self.file_id, updates)
+        else:
+            # Managers without batch support still get every update, one frame each
+            for agent_name, status, message, data in updates:
+                await self.websocket_manager.send_agent_update(self.file_id, agent_name, status, message, data)
+
+# --------------------------------------------------
+# LLM Fallback Classifier with Enhanced Prompts
+# --------------------------------------------------
+
+async def llm_fallback_classifier(state: IngestionState) -> dict:
+    if state.confidence >= LLM_FALLBACK_THRESHOLD:
+        logger.info("[SKIP] LLM fallback not required")
+        return {}
+
+    logger.warning("[LLM] Invoking AI-powered fallback classifier")
+    
+    # Progress updates are buffered and sent together before the model call
+    batcher = _UpdateBatcher(state.websocket_manager, state.file_id)
+    batcher.add(
+        AGENT_LLM_CLASSIFIER,
+        STATUS_PROCESSING,
+        "🤖 Analyzing data with AI - Loading classification prompts..."
+    )
+
+    # Load prompts off the event loop while the file-specific context is prepared
+    prompts_task = asyncio.create_task(asyncio.to_thread(_load_prompts))
+
+    analysis_context = {
+        "file_name": state.file_name,
+        "columns": state.columns,
+        "sample_rows": _format_sample_rows(state.sample_rows),
+        "previous_analysis": state.reasoning or "No previous analysis"
+    }
+
+    prompts = await prompts_task
+    prompt_template = _build_prompt_template(
+        prompts["system"].prompt_text,
+        prompts["task"].prompt_text,
+        prompts["safety"].prompt_text,
+        prompts["response"].prompt_text
+    )
+
+    batcher.add(
+        AGENT_LLM_CLASSIFIER,
+        STATUS_PROCESSING,
+        "🧠 AI analysis in progress - Examining data patterns and structure..."
+    )
+
+    # Build comprehensive prompt
+    full_prompt = prompt_template.format_map(analysis_context)
+
     try:
-        # Send WebSocket update about LLM invocation
-        if state.get("websocket_manager"):
-            await state["websocket_manager"].send_agent_update(
-                state["file_id"],
-                "AI Classifier",
-                "processing",
-                "🔍 AI model analyzing data structure and content patterns..."
-            )
+        batcher.add(
+            AGENT_LLM_CLASSIFIER,
+            STATUS_PROCESSING,
+            "🔍 AI model analyzing data structure and content patterns..."
+        )
+        await batcher.flush()
         
-        response = llm.invoke(full_prompt)
+        response = await llm_coalescer.submit(full_prompt)
         logger.info("[LLM RESPONSE] Raw response received")
 
         # Parse response with error handling
         try:
-            parsed = json.loads(response.content)
-        except json.JSONDecodeError as e:
+            parsed = _json_loads(response.content)
+        except ValueError as e:
             logger.error(f"Error parsing LLM response: {e}")
             # Fallback response
             parsed = {
@@ -331,23 +613,21 @@ CLASSIFICATION REQUIREMENTS:
         logger.info(f"[LLM RESULT] data_type={parsed['data_type']} confidence={parsed['confidence']}")
         
         # Send successful WebSocket update
-        if state.get("websocket_manager"):
-            await state["websocket_manager"].send_agent_update(
-                state["file_id"],
-                "AI Classifier",
-                "completed",
-                f"🎯 AI Classification Complete: {parsed['data_type']} (confidence: {parsed['confidence']:.1%})",
-                {
-                    "classification": parsed['data_type'],
-                    "confidence": parsed['confidence'],
-                    "reasoning": parsed['reasoning'],
-                    "method": "llm",
-                    "model_used": "gpt-4o-mini"
-                }
-            )
+        batcher.add(
+            AGENT_LLM_CLASSIFIER,
+            STATUS_COMPLETED,
+            f"🎯 AI Classification Complete: {parsed['data_type']} (confidence: {parsed['confidence']:.1%})",
+            {
+                "classification": parsed['data_type'],
+                "confidence": parsed['confidence'],
+                "reasoning": parsed['reasoning'],
+                "method": "llm",
+                "model_used": "gpt-4o-mini"
+            }
+        )
+        await batcher.flush()
 
         return {
-            **state,
             "data_type": parsed["data_type"],
             "confidence": parsed["confidence"],
             "method": "llm",
@@ -357,19 +637,17 @@ CLASSIFICATION REQUIREMENTS:
     except Exception as e:
         logger.error(f"LLM classification error: {e}")
         
-        # Send error WebSocket update
-        if state.get("websocket_manager"):
-            await state["websocket_manager"].send_agent_update(
-                state["file_id"],
-                "AI Classifier",
-                "error",
-                f"❌ AI classification failed: {str(e)}",
-                {"error": str(e)}
-            )
+        # Send error WebSocket update, along with any progress still buffered
+        batcher.add(
+            AGENT_LLM_CLASSIFIER,
+            STATUS_ERROR,
+            f"❌ AI classification failed: {str(e)}",
+            {"error": str(e)}
+        )
+        await batcher.flush()
         
         # Return fallback classification
         return {
-            **state,
             "data_type": "document",
             "confidence": 0.2,
             "method": "llm",
@@ -380,38 +658,27 @@ CLASSIFICATION REQUIREMENTS:
 # Storage Decision with WebSocket Updates
 # --------------------------------------------------
 
-async def storage_decision(state: IngestionState) -> IngestionState:
+async def storage_decision(state: IngestionState) -> dict:
     # Determine storage type based on classification
-    if state["data_type"] in ["transaction"]:
-        storage = "SQL_DATABASE"
-        storage_description = "Structured SQL database for transaction records"
-    elif state["data_type"] in ["reference"]:
-        storage = "SQL_DATABASE" 
-        storage_description = "Structured SQL database for reference data (rate cards, routing rules)"
-    else:  # document
-        storage = "VECTOR_DATABASE"
-        storage_description = "Vector database for document embeddings and RAG"
-
-    logger.info(f"[STORAGE] Data type {state['data_type']} → {storage}")
+    storage, storage_description = STORAGE_MAP.get(state.data_type, DOCUMENT_STORAGE)
+
+    logger.info(f"[STORAGE] Data type {state.data_type} → {storage}")
     
     # Send WebSocket update
-    if state.get("websocket_manager"):
-        await state["websocket_manager"].send_agent_update(
-            state["file_id"],
-            "Storage Decision Agent",
-            "completed",
+    if state.websocket_manager:
+        await state.websocket_manager.send_agent_update(
+            state.file_id,
+            AGENT_STORAGE_DECISION,
+            STATUS_COMPLETED,
             f"📊 Storage Decision: {storage}",
+            # The classifier update already carried data_type, method and confidence
             {
-                "data_type": state["data_type"],
                 "storage_type": storage,
-                "storage_description": storage_description,
-                "classification_method": state.get("method", "unknown"),
-                "confidence": state.get("confidence", 0.0)
+                "storage_description": storage_description
             }
         )
 
     return {
-        **state,
         "storage_type": storage
     }
 
@@ -419,6 +686,13 @@ async def storage_decision(state: IngestionState) -> IngestionState:
 # Build LangGraph
 # --------------------------------------------------
 
+def route_after_rules(state: IngestionState) -> str:
+    """Finish on confident rule matches (storage already decided), otherwise ask the LLM."""
+    if state.confidence >= LLM_FALLBACK_THRESHOLD:
+        return END
+    return "llm_classifier"
+
+
 def build_ingestion_graph():
     logger.info("[INIT] Building ingestion agent graph")
 
@@ -429,7 +703,14 @@ def build_ingestion_graph():
     graph.add_node("storage_decision", storage_decision)
 
     graph.set_entry_point("rule_classifier")
-    graph.add_edge("rule_classifier", "llm_classifier")
+    graph.add_conditional_edges(
+        "rule_classifier",
+        route_after_rules,
+        {
+            END: END,
+            "llm_classifier": "llm_classifier"
+        }
+    )
     graph.add_edge("llm_classifier", "storage_decision")
     graph.add_edge("storage_decision", END)
 
@@ -437,6 +718,10 @@ def build_ingestion_graph():
 
     return graph.compile()
 
+
+# Compiled once at import and shared by every orchestrator
+_COMPILED_GRAPH = build_ingestion_graph()
+
 # --------------------------------------------------
 # Enhanced Ingestion Orchestrator
 # --------------------------------------------------
@@ -448,7 +733,7 @@ class IngestionOrchestrator:
     
     def __init__(self, websocket_manager=None):
         self.websocket_manager = websocket_manager
-        self.graph = build_ingestion_graph()
+        self.graph = _COMPILED_GRAPH
     
     async def process_file(self, file_id: str, file_name: str, columns: List[str], sample_rows: List[dict]) -> dict:
         """
@@ -475,8 +760,8 @@ class IngestionOrchestrator:
             if self.websocket_manager:
                 await self.websocket_manager.send_agent_update(
                     file_id,
-                    "Ingestion Orchestrator",
-                    "processing",
+                    AGENT_ORCHESTRATOR,
+                    STATUS_PROCESSING,
                     "🚀 Starting intelligent data classification pipeline..."
                 )
             
@@ -510,8 +795,8 @@ class IngestionOrchestrator:
             if self.websocket_manager:
                 await self.websocket_manager.send_agent_update(
                     file_id,
-                    "Ingestion Orchestrator",
-                    "error",
+                    AGENT_ORCHESTRATOR,
+                    STATUS_ERROR,
                     f"❌ Pipeline failed: {str(e)}"
                 )
             
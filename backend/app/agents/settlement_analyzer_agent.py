@@ -13,11 +13,73 @@ import logging
 import asyncio
 from datetime import datetime, date, timedelta
 from typing import Dict, Any, Optional, Callable
-import random
-import statistics
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
 logger = logging.getLogger("settlement-analyzer-agent")
 
+# Acquirers settling batches, indexed by the acquirer codes drawn for each batch
+SETTLEMENT_ACQUIRERS = ("Primary Bank", "Secondary Bank", "Backup Acquirer")
+
+# Simulated discrepancy types, indexed by the codes drawn for each batch
+DISCREPANCY_TYPES = ("amount_mismatch", "missing_transactions", "duplicate_entry")
+AMOUNT_MISMATCH, MISSING_TRANSACTIONS, DUPLICATE_ENTRY = range(len(DISCREPANCY_TYPES))
+
+# Discrepancy severities, indexed by the severity codes computed during validation
+SEVERITY_LEVELS = ("high", "medium", "low")
+
+def _percentage_difference(amount_difference, expected):
+    """Difference as a percentage of the expected amount; 0 when nothing was expected"""
+    return (amount_difference / expected) * 100 if expected > 0 else 0.0
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _classify(expected, actual):
+        """
+        Single-pass discrepancy classifier; returns (is_discrepancy, severity codes,
+        per-severity discrepancy counts, accurate settlement count)
+        """
+        n = expected.size
+        is_discrepancy = np.zeros(n, dtype=np.bool_)
+        severity = np.empty(n, dtype=np.int8)
+        severity_counts = np.zeros(3, dtype=np.int64)
+        accurate = 0
+        for i in range(n):
+            amount_difference = abs(expected[i] - actual[i])
+            percentage = (amount_difference / expected[i]) * 100 if expected[i] > 0 else 0.0
+            if percentage > 1.0:
+                severity[i] = 0
+            elif percentage > 0.5:
+                severity[i] = 1
+            else:
+                severity[i] = 2
+            if amount_difference > 1.0 or percentage > 0.1:  # $1 or 0.1% threshold
+                is_discrepancy[i] = True
+                severity_counts[severity[i]] += 1
+            else:
+                accurate += 1
+        return is_discrepancy, severity, severity_counts, accurate
+
+    # Compile at import so the first analysis does not pay for it
+    _classify(np.ones(2), np.ones(2))
+else:
+    def _classify(expected, actual):
+        """Returns (is_discrepancy, severity codes, per-severity discrepancy counts, accurate settlement count)"""
+        amount_difference = np.abs(expected - actual)
+        percentage = np.divide(amount_difference, expected, out=np.zeros(expected.size), where=expected > 0) * 100
+        is_discrepancy = (amount_difference > 1.0) | (percentage > 0.1)  # $1 or 0.1% threshold
+        severity = np.where(percentage > 1.0, 0, np.where(percentage > 0.5, 1, 2)).astype(np.int8)
+        severity_counts = np.bincount(severity[is_discrepancy], minlength=3)
+        return is_discrepancy, severity, severity_counts, expected.size - int(is_discrepancy.sum())
+
+
 class SettlementAnalyzerAgent:
     """
     Agent responsible for analyzing settlement accuracy and identifying discrepancies
@@ -46,20 +108,14 @@ class SettlementAnalyzerAgent:
             if progress_callback:
                 await progress_callback(25, f"Loaded settlement data for {settlement_data['total_settlements']} settlements")
             
-            # Step 2: Validate settlement accuracy
-            accuracy_analysis = await self._validate_settlement_accuracy(settlement_data)
-            if progress_callback:
-                await progress_callback(45, "Validated settlement accuracy and identified discrepancies")
-            
-            # Step 3: Analyze payment flows
-            flow_analysis = await self._analyze_payment_flows(settlement_data)
-            if progress_callback:
-                await progress_callback(65, "Analyzed payment flows and processing times")
-            
-            # Step 4: Check reconciliation status
-            reconciliation_status = await self._check_reconciliation_status(settlement_data)
+            # Steps 2-4: Accuracy, payment flows and reconciliation only read settlement_data, so run them concurrently
+            accuracy_analysis, flow_analysis, reconciliation_status = await asyncio.gather(
+                self._validate_settlement_accuracy(settlement_data),
+                self._analyze_payment_flows(settlement_data),
+                self._check_reconciliation_status(settlement_data)
+            )
             if progress_callback:
-                await progress_callback(80, "Checked reconciliation status and matching")
+                await progress_callback(80, "Validated settlement accuracy, payment flows and reconciliation status")
             
             # Step 5: Generate settlement recommendations
             settlement_recommendations = await self._generate_settlement_recommendations(
@@ -72,7 +128,7 @@ class SettlementAnalyzerAgent:
                 "agent_name": self.name,
                 "execution_date": execution_date.isoformat(),
                 "status": "completed",
-                "settlement_data": settlement_data,
+                "settlement_data": {key: value for key, value in settlement_data.items() if key != "columns"},
                 "accuracy_analysis": accuracy_analysis,
                 "flow_analysis": flow_analysis,
                 "reconciliation_status": reconciliation_status,
@@ -98,49 +154,65 @@ class SettlementAnalyzerAgent:
         """Load settlement and transaction data for analysis"""
         await asyncio.sleep(0.5)  # Simulate data loading
         
-        # Simulate realistic settlement data
-        total_settlements = random.randint(50, 200)  # Daily settlement batches
-        total_transactions = random.randint(8000, 15000)
-        total_settlement_amount = random.uniform(2000000, 5000000)  # $2M - $5M
+        # Simulate realistic settlement data, drawing each column for every batch at once
+        rng = np.random.default_rng()
+        total_settlements = int(rng.integers(50, 201))  # Daily settlement batches
+        total_transactions = int(rng.integers(8000, 15001))
+        total_settlement_amount = float(rng.uniform(2000000, 5000000))  # $2M - $5M
         
         # Settlement batches by acquirer
-        settlement_batches = []
-        acquirers = ["Primary Bank", "Secondary Bank", "Backup Acquirer"]
+        n = total_settlements
+        acquirer_idx = rng.integers(0, len(SETTLEMENT_ACQUIRERS), n)
+        batch_transactions = rng.integers(20, 201, n)
+        batch_amount = rng.uniform(5000, 100000, n)
+        processing_time = rng.uniform(2, 48, n)  # Hours to process
+        fee_rate = rng.uniform(0.015, 0.025, n)  # 1.5-2.5% fees
         
-        for i in range(total_settlements):
-            acquirer = random.choice(acquirers)
-            batch_transactions = random.randint(20, 200)
-            batch_amount = random.uniform(5000, 100000)
-            
-            # Simulate some discrepancies
-            has_discrepancy = random.random() < 0.05  # 5% chance of discrepancy
-            expected_amount = batch_amount
-            actual_amount = batch_amount
-            
-            if has_discrepancy:
-                # Create realistic discrepancies
-                discrepancy_type = random.choice(["amount_mismatch", "missing_transactions", "duplicate_entry"])
-                if discrepancy_type == "amount_mismatch":
-                    actual_amount = batch_amount * random.uniform(0.95, 1.05)  # ±5% variance
-                elif discrepancy_type == "missing_transactions":
-                    batch_transactions -= random.randint(1, 5)
-                    actual_amount = batch_amount * 0.95
-            
-            settlement_batch = {
-                "batch_id": f"SETTLE_{execution_date.strftime('%Y%m%d')}_{i+1:03d}",
-                "acquirer": acquirer,
-                "transaction_count": batch_transactions,
-                "expected_amount": round(expected_amount, 2),
-                "actual_amount": round(actual_amount, 2),
-                "settlement_date": execution_date.isoformat(),
-                "processing_time": random.uniform(2, 48),  # Hours to process
-                "status": "completed" if not has_discrepancy else "discrepancy",
-                "reconciled": not has_discrepancy or random.random() > 0.3,  # 70% of discrepancies get reconciled
-                "fees_deducted": round(batch_amount * random.uniform(0.015, 0.025), 2),  # 1.5-2.5% fees
+        # Simulate some discrepancies (5% chance) of each type
+        has_discrepancy = rng.random(n) < 0.05
+        discrepancy_type = rng.integers(0, len(DISCREPANCY_TYPES), n)
+        amount_mismatch = has_discrepancy & (discrepancy_type == AMOUNT_MISMATCH)
+        missing_transactions = has_discrepancy & (discrepancy_type == MISSING_TRANSACTIONS)
+        actual_amount = np.where(
+            amount_mismatch, batch_amount * rng.uniform(0.95, 1.05, n),  # ±5% variance
+            np.where(missing_transactions, batch_amount * 0.95, batch_amount)
+        )
+        batch_transactions = np.where(missing_transactions, batch_transactions - rng.integers(1, 6, n), batch_transactions)
+        reconciled = ~has_discrepancy | (rng.random(n) > 0.3)  # 70% of discrepancies get reconciled
+        
+        # Batch data is kept column by column for the analysis steps; amounts
+        # are rounded to cents as they are reported
+        columns = {
+            "expected": np.round(batch_amount, 2),
+            "actual": np.round(actual_amount, 2),
+            "processing_time": processing_time,
+            "reconciled": reconciled,
+            "acquirer": acquirer_idx
+        }
+        
+        # The batch dicts are only built for the response
+        batch_prefix = f"SETTLE_{execution_date.strftime('%Y%m%d')}_"
+        settlement_date = execution_date.isoformat()
+        settlement_batches = [
+            {
+                "batch_id": f"{batch_prefix}{i + 1:03d}",
+                "acquirer": SETTLEMENT_ACQUIRERS[acquirer],
+                "transaction_count": transactions,
+                "expected_amount": expected,
+                "actual_amount": actual,
+                "settlement_date": settlement_date,
+                "processing_time": hours,
+                "status": "discrepancy" if discrepancy else "completed",
+                "reconciled": is_reconciled,
+                "fees_deducted": fees,
                 "currency": "USD"
             }
-            
-            settlement_batches.append(settlement_batch)
+            for i, (acquirer, transactions, expected, actual, hours, discrepancy, is_reconciled, fees) in enumerate(zip(
+                acquirer_idx.tolist(), batch_transactions.tolist(), columns["expected"].tolist(),
+                columns["actual"].tolist(), processing_time.tolist(), has_discrepancy.tolist(),
+                reconciled.tolist(), np.round(batch_amount * fee_rate, 2).tolist()
+            ))
+        ]
         
         return {
             "execution_date": execution_date.isoformat(),
@@ -148,6 +220,7 @@ class SettlementAnalyzerAgent:
             "total_transactions": total_transactions,
             "total_settlement_amount": total_settlement_amount,
             "settlement_batches": settlement_batches,
+            "columns": columns,
             "data_quality": "high"
         }
     
@@ -156,40 +229,35 @@ class SettlementAnalyzerAgent:
         await asyncio.sleep(0.4)  # Simulate validation
         
         settlement_batches = settlement_data["settlement_batches"]
-        discrepancies = []
-        total_expected = 0
-        total_actual = 0
-        accurate_settlements = 0
+        columns = settlement_data["columns"]
+        expected = columns["expected"]
+        actual = columns["actual"]
+        n = len(expected)
         
-        for batch in settlement_batches:
-            expected = batch["expected_amount"]
-            actual = batch["actual_amount"]
-            total_expected += expected
-            total_actual += actual
-            
-            # Check for discrepancies
-            amount_difference = abs(expected - actual)
-            percentage_difference = (amount_difference / expected) * 100 if expected > 0 else 0
-            
-            if amount_difference > 1.0 or percentage_difference > 0.1:  # $1 or 0.1% threshold
-                discrepancy_severity = "high" if percentage_difference > 1.0 else "medium" if percentage_difference > 0.5 else "low"
-                
-                discrepancies.append({
-                    "batch_id": batch["batch_id"],
-                    "acquirer": batch["acquirer"],
-                    "expected_amount": expected,
-                    "actual_amount": actual,
-                    "difference": round(amount_difference, 2),
-                    "percentage_difference": round(percentage_difference, 4),
-                    "severity": discrepancy_severity,
-                    "status": batch["status"],
-                    "reconciled": batch["reconciled"]
-                })
-            else:
-                accurate_settlements += 1
+        # Check every batch for discrepancies at once; severity codes index
+        # SEVERITY_LEVELS: above 1% is high, above 0.5% medium, otherwise low
+        is_discrepancy, severity_codes, severity_counts, accurate_settlements = _classify(expected, actual)
+        high_severity, medium_severity, low_severity = severity_counts.tolist()
+        
+        # Only the flagged batches are materialized as dicts
+        discrepancies = []
+        for i in np.flatnonzero(is_discrepancy).tolist():
+            batch = settlement_batches[i]
+            amount_difference = abs(batch["expected_amount"] - batch["actual_amount"])
+            discrepancies.append({
+                "batch_id": batch["batch_id"],
+                "acquirer": batch["acquirer"],
+                "expected_amount": batch["expected_amount"],
+                "actual_amount": batch["actual_amount"],
+                "difference": round(amount_difference, 2),
+                "percentage_difference": round(_percentage_difference(amount_difference, batch["expected_amount"]), 4),
+                "severity": SEVERITY_LEVELS[severity_codes[i]],
+                "status": batch["status"],
+                "reconciled": batch["reconciled"]
+            })
         
         # Calculate accuracy metrics
-        total_settlements = len(settlement_batches)
+        total_settlements = n
         accuracy_percentage = (accurate_settlements / total_settlements) * 100 if total_settlements > 0 else 0
         
         return {
@@ -199,9 +267,9 @@ class SettlementAnalyzerAgent:
             "discrepancies": discrepancies,
             "discrepancy_summary": {
                 "total_discrepancies": len(discrepancies),
-                "high_severity": len([d for d in discrepancies if d["severity"] == "high"]),
-                "medium_severity": len([d for d in discrepancies if d["severity"] == "medium"]),
-                "low_severity": len([d for d in discrepancies if d["severity"] == "low"])
+                "high_severity": high_severity,
+                "medium_severity": medium_severity,
+                "low_severity": low_severity
             }
         }
     
@@ -209,20 +277,20 @@ class SettlementAnalyzerAgent:
         """Analyze payment flows and processing times"""
         await asyncio.sleep(0.3)  # Simulate analysis
         
-        settlement_batches = settlement_data["settlement_batches"]
-        processing_times = [batch["processing_time"] for batch in settlement_batches]
+        processing_times = settlement_data["columns"]["processing_time"]
+        n = len(processing_times)
         
         flow_metrics = {
-            "avg_processing_time": round(statistics.mean(processing_times), 2),
-            "median_processing_time": round(statistics.median(processing_times), 2),
-            "max_processing_time": round(max(processing_times), 2),
-            "min_processing_time": round(min(processing_times), 2)
+            "avg_processing_time": round(float(processing_times.mean()), 2),
+            "median_processing_time": round(float(np.median(processing_times)), 2),
+            "max_processing_time": round(float(processing_times.max()), 2),
+            "min_processing_time": round(float(processing_times.min()), 2)
         }
         
         # SLA compliance (24 hour target)
         sla_target = 24
-        sla_compliant = len([t for t in processing_times if t <= sla_target])
-        sla_compliance_rate = (sla_compliant / len(processing_times)) * 100 if processing_times else 0
+        sla_compliant = int((processing_times <= sla_target).sum())
+        sla_compliance_rate = (sla_compliant / n) * 100 if n else 0
         
         return {
             "flow_metrics": flow_metrics,
@@ -230,7 +298,7 @@ class SettlementAnalyzerAgent:
                 "target_hours": sla_target,
                 "compliance_rate": round(sla_compliance_rate, 2),
                 "compliant_settlements": sla_compliant,
-                "total_settlements": len(processing_times)
+                "total_settlements": n
             }
         }
     
@@ -238,9 +306,9 @@ class SettlementAnalyzerAgent:
         """Check reconciliation status and matching accuracy"""
         await asyncio.sleep(0.3)  # Simulate checking
         
-        settlement_batches = settlement_data["settlement_batches"]
-        total_settlements = len(settlement_batches)
-        reconciled_settlements = len([b for b in settlement_batches if b["reconciled"]])
+        reconciled = settlement_data["columns"]["reconciled"]
+        total_settlements = len(reconciled)
+        reconciled_settlements = int(reconciled.sum())
         
         reconciliation_rate = (reconciled_settlements / total_settlements) * 100 if total_settlements > 0 else 0
         
@@ -8,6 +8,7 @@ from typing import List
 from app.db.database import SessionLocal
 from app.schemas.prompt import PromptCreate, PromptResponse
 from app.services.prompt_service import create_prompt, get_active_prompt
+from app.agents.ingestion_graph import clear_prompt_cache
 from app.db.models import Prompt
 
 router = APIRouter(prefix="/prompts")
@@ -21,7 +22,9 @@ def get_db():
 
 @router.post("/", response_model=PromptResponse)
 def create_prompt_api(prompt: PromptCreate, db: Session = Depends(get_db)):
-    return create_prompt(db, prompt)
+    created = create_prompt(db, prompt)
+    clear_prompt_cache()
+    return created
 
 @router.get("/active", response_model=PromptResponse)
 def get_active(agent_role: str, prompt_type: str = "system", db: Session = Depends(get_db)):
@@ -64,6 +67,7 @@ def update_prompt(prompt_id: int, prompt_data: PromptCreate, db: Session = Depen
     
     db.commit()
     db.refresh(prompt)
+    clear_prompt_cache()
     return prompt
 
 @router.delete("/{prompt_id}")
@@ -75,6 +79,7 @@ def delete_prompt(prompt_id: int, db: Session = Depends(get_db)):
     
     db.delete(prompt)
     db.commit()
+    clear_prompt_cache()
     return {"message": "Prompt deleted successfully"}
 
 @router.get("/agents/roles")
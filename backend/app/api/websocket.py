@@ -58,6 +58,30 @@ class ConnectionManager:
         }
         await self.send_progress_update(file_id, update)
     
+    async def send_batch(self, file_id: str, updates: List[dict]):
+        """Send several agent updates for a file in a single WebSocket frame"""
+        if not updates:
+            return
+        timestamp = datetime.utcnow().isoformat()
+        batch = {
+            "type": "agent_update_batch",
+            "timestamp": timestamp,
+            "file_id": file_id,
+            "updates": [
+                {
+                    "type": "agent_update",
+                    "timestamp": timestamp,
+                    "file_id": file_id,
+                    "agent": agent_name,
+                    "status": status,
+                    "message": message,
+                    "data": data or {}
+                }
+                for agent_name, status, message, data in updates
+            ]
+        }
+        await self.send_progress_update(file_id, batch)
+    
     async def send_classification_update(self, file_id: str, classification_result: dict):
         """Send classification results with confidence and reasoning"""
         update = {
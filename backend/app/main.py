@@ -9,6 +9,8 @@ WHY:
 
 from dotenv import load_dotenv
 load_dotenv()   # 👈 THIS IS REQUIRED
+import asyncio
+import sys
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.ingest import router as ingest_router
@@ -24,6 +26,7 @@ from app.api.insights import router as insights_router
 from app.api.upload import router as upload_router
 from app.api.classification import router as classification_router
 from app.api.chatbot import router as chatbot_router
+from app.agents.ingestion_graph import preload_prompts
 from app.db.database import engine
 from app.db import models
 from app.models.user import User
@@ -58,6 +61,20 @@ app.include_router(upload_router, prefix="/api/upload")
 app.include_router(classification_router, prefix="/api/classification")
 app.include_router(chatbot_router, prefix="/api/chatbot")
 
+@app.on_event("startup")
+async def preload_ingestion_prompts():
+    """Warm the ingestion prompt cache so the first LLM fallback skips the database."""
+    await asyncio.to_thread(preload_prompts)
+
+
+@app.on_event("shutdown")
+def shutdown_pdf_extraction_pool():
+    """Stop the PDF extraction workers, if the document processor was loaded."""
+    document_processor = sys.modules.get("app.agents.document_processor")
+    if document_processor is not None:
+        document_processor.shutdown_pdf_pool()
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -53,3 +53,17 @@ def get_active_prompt(db: Session, agent_role: str, prompt_type: str):
         Prompt.prompt_type == prompt_type,
         Prompt.is_active == True
     ).first()
+
+
+def get_active_prompts(db: Session, agent_role: str, prompt_types):
+    """
+    Fetch several active prompts for an agent role in a single query.
+
+    Returns a dict keyed by prompt_type; types without an active prompt are omitted.
+    """
+    prompts = db.query(Prompt).filter(
+        Prompt.agent_role == agent_role,
+        Prompt.prompt_type.in_(list(prompt_types)),
+        Prompt.is_active == True
+    ).all()
+    return {prompt.prompt_type: prompt for prompt in prompts}
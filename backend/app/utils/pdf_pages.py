@@ -0,0 +1,30 @@
+"""
+PDF page extraction utilities.
+
+Purpose:
+- Extract text for a contiguous range of PDF pages
+- Stay light to import, since PDF extraction worker processes import this
+  module on start-up
+"""
+
+import logging
+from typing import List, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+
+def extract_pdf_page_range(file_path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Extract text for pages [start, stop) using its own document handle"""
+    pages = []
+    with fitz.open(file_path) as doc:
+        for page_num in range(start, stop):
+            try:
+                page_text = doc[page_num].get_text()
+                if page_text:
+                    pages.append((page_num, page_text))
+            except Exception as e:
+                logger.warning(f"Error extracting text from page {page_num + 1}: {str(e)}")
+                continue
+    return pages